@@ -3,6 +3,12 @@
 # Database configuration
 DATABASE_PATH = 'data/royal_road.db'
 
+# Dashboard cache configuration
+DASHBOARD_CACHE_DIR = 'data/.cache'
+
+# Columnar copy of the full snapshot history, refreshed by utils.load_latest_data
+SNAPSHOT_MIRROR_PATH = 'data/.cache/all_snapshots.parquet'
+
 # Scraping configuration
 BASE_URL = "https://www.royalroad.com"
 HEADERS = {
@@ -22,31 +28,51 @@ PLOTLY_CONFIG = {
 }
 
 # Standard SQL queries for data loading
-LATEST_STORIES_QUERY = """
+# Both also return the snapshot time as Unix seconds (scraped_epoch), which
+# converts to datetimes far faster than parsing the scraped_date strings
+# The latest snapshot per story comes from the trigger-maintained latest_snapshots
+# table, one primary key lookup per story instead of ranking every snapshot
+_LATEST_STORIES_SELECT = """
 SELECT 
     s.id, s.royal_road_id, s.title, s.url, s.genres AS genre, s.first_seen, s.last_updated,
     ss.rating, ss.followers, ss.pages, ss.chapters, ss.views, 
-    ss.favorites, ss.ratings_count, ss.snapshot_date AS scraped_date
+    ss.favorites, ss.ratings_count, ss.snapshot_date AS scraped_date,
+    CAST(strftime('%s', ss.snapshot_date) AS INTEGER) AS scraped_epoch
 FROM stories s
-JOIN (
-    SELECT story_id, MAX(snapshot_date) AS max_date
-    FROM story_snapshots
-    GROUP BY story_id
-) latest ON s.id = latest.story_id
-JOIN story_snapshots ss ON latest.story_id = ss.story_id AND latest.max_date = ss.snapshot_date
+JOIN {latest} ls ON ls.story_id = s.id
+JOIN story_snapshots ss ON ss.id = ls.snapshot_id
 """
 
+# Databases the scraper hasn't opened since latest_snapshots was added don't have
+# the table yet (the scraper creates and backfills it); the *_FALLBACK queries
+# rank the history instead, picking the same snapshot as the backfill
+LATEST_SNAPSHOTS_FALLBACK = """(
+    SELECT story_id, id AS snapshot_id FROM (
+        SELECT story_id, id,
+               ROW_NUMBER() OVER (PARTITION BY story_id ORDER BY snapshot_date DESC, id DESC) AS rn
+        FROM story_snapshots
+    )
+    WHERE rn = 1
+)"""
+
+LATEST_STORIES_QUERY = _LATEST_STORIES_SELECT.format(latest='latest_snapshots')
+LATEST_STORIES_FALLBACK_QUERY = _LATEST_STORIES_SELECT.format(latest=LATEST_SNAPSHOTS_FALLBACK)
+
+# History queries order by story_id DESC, snapshot_date so SQLite can stream rows
+# straight off idx_story_snapshots_story_latest (scanned backwards) with no sort step;
+# rows stay chronological within each story
 ALL_SNAPSHOTS_QUERY = """
 SELECT 
     s.id, s.royal_road_id, s.title, s.url, s.genres AS genre, 
     ss.rating, ss.followers, ss.pages, ss.chapters, ss.views, 
-    ss.favorites, ss.ratings_count, ss.snapshot_date AS scraped_date
+    ss.favorites, ss.ratings_count, ss.snapshot_date AS scraped_date,
+    CAST(strftime('%s', ss.snapshot_date) AS INTEGER) AS scraped_epoch
 FROM stories s
 JOIN story_snapshots ss ON s.id = ss.story_id
-ORDER BY s.royal_road_id, ss.snapshot_date
+ORDER BY ss.story_id DESC, ss.snapshot_date
 """
 
-DASHBOARD_LATEST_QUERY = """
+_DASHBOARD_LATEST_SELECT = """
 SELECT s.royal_road_id, s.title, s.url, s.genres, 
        COALESCE(ss.rating, 0) as rating,
        COALESCE(ss.followers, 0) as followers,
@@ -54,17 +80,51 @@ SELECT s.royal_road_id, s.title, s.url, s.genres,
        COALESCE(ss.chapters, 0) as chapters,
        ss.snapshot_date
 FROM stories s
-JOIN (
-    SELECT story_id, MAX(snapshot_date) as max_date
-    FROM story_snapshots
-    GROUP BY story_id
-) latest ON s.id = latest.story_id
-JOIN story_snapshots ss ON latest.story_id = ss.story_id AND latest.max_date = ss.snapshot_date
+JOIN {latest} ls ON ls.story_id = s.id
+JOIN story_snapshots ss ON ss.id = ls.snapshot_id
+"""
+
+DASHBOARD_LATEST_QUERY = _DASHBOARD_LATEST_SELECT.format(latest='latest_snapshots')
+DASHBOARD_LATEST_FALLBACK_QUERY = _DASHBOARD_LATEST_SELECT.format(latest=LATEST_SNAPSHOTS_FALLBACK)
+
+# Story counts per genre, served by the normalized genre tables
+DASHBOARD_GENRE_COUNTS_QUERY = """
+SELECT g.name AS genre, COUNT(*) AS stories
+FROM story_genres sg
+JOIN genres g ON g.id = sg.genre_id
+GROUP BY g.name
+ORDER BY stories DESC, g.name
+LIMIT 15
+"""
+
+# Time-series queries only return stories with more than one snapshot,
+# since single-snapshot stories have nothing to plot
+MULTI_SNAPSHOT_STORY_IDS = """
+SELECT story_id
+FROM story_snapshots
+GROUP BY story_id
+HAVING COUNT(*) > 1
+"""
+
+DASHBOARD_TIMESERIES_QUERY = f"""
+SELECT s.title, ss.snapshot_date, ss.views, ss.followers, ss.rating
+FROM stories s
+JOIN story_snapshots ss ON s.id = ss.story_id
+WHERE s.id IN ({MULTI_SNAPSHOT_STORY_IDS})
+ORDER BY ss.story_id DESC, ss.snapshot_date
+"""
+
+DASHBOARD_TIMESERIES_TITLES_QUERY = f"""
+SELECT DISTINCT s.title
+FROM stories s
+WHERE s.id IN ({MULTI_SNAPSHOT_STORY_IDS})
+ORDER BY s.title
 """
 
-DASHBOARD_TIMESERIES_QUERY = """
+DASHBOARD_STORY_TIMESERIES_QUERY = """
 SELECT s.title, ss.snapshot_date, ss.views, ss.followers, ss.rating
 FROM stories s
 JOIN story_snapshots ss ON s.id = ss.story_id
-ORDER BY s.title, ss.snapshot_date
+WHERE s.title = ?
+ORDER BY ss.snapshot_date
 """
\ No newline at end of file
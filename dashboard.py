@@ -1,10 +1,18 @@
+import sqlite3
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
-import sqlite3
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from config import DATABASE_PATH, DASHBOARD_LATEST_QUERY, DASHBOARD_TIMESERIES_QUERY
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from database import borrow, get_database_mtime
+from utils import parquet_cache_is_current, write_parquet_cache
+from config import (
+    DASHBOARD_CACHE_DIR, DASHBOARD_LATEST_QUERY, DASHBOARD_LATEST_FALLBACK_QUERY, DASHBOARD_GENRE_COUNTS_QUERY, DASHBOARD_TIMESERIES_QUERY,
+    DASHBOARD_TIMESERIES_TITLES_QUERY, DASHBOARD_STORY_TIMESERIES_QUERY
+)
 
 # Page configuration
 st.set_page_config(
@@ -13,29 +21,113 @@ st.set_page_config(
     layout="wide"
 )
 
-@st.cache_data
-def load_data():
-    """Load data from SQLite database"""
+# Loaders are keyed on db_mtime, so each scrape adds an entry; keep only the
+# newest few so a long-running dashboard doesn't hold every past read
+@st.cache_data(max_entries=2)
+def load_data(db_mtime):
+    """
+    Load data from SQLite database
+    
+    The result is also kept as Parquet under DASHBOARD_CACHE_DIR, so a restarted
+    worker can skip the query until the database changes. db_mtime comes from
+    get_database_mtime(), taken before the query, and keys both caches.
+    """
     try:
-        db_path = Path(DATABASE_PATH)
-        conn = sqlite3.connect(db_path)
+        cache_path = Path(DASHBOARD_CACHE_DIR) / 'stories_latest.parquet'
+        if parquet_cache_is_current(cache_path, db_mtime):
+            return pd.read_parquet(cache_path, dtype_backend='pyarrow')
         
-        df = pd.read_sql_query(DASHBOARD_LATEST_QUERY, conn)
-        conn.close()
+        # Arrow-backed columns keep genres as Arrow strings, so the str.split
+        # below runs in Arrow compute kernels instead of per-object Python calls
+        with borrow() as conn:
+            try:
+                df = pd.read_sql_query(DASHBOARD_LATEST_QUERY, conn, dtype_backend='pyarrow')
+            except (sqlite3.OperationalError, pd.errors.DatabaseError):
+                # The database predates latest_snapshots; the scraper adds it on its next run
+                df = pd.read_sql_query(DASHBOARD_LATEST_FALLBACK_QUERY, conn, dtype_backend='pyarrow')
         
-        # Expand genres into a list
-        df['genre_list'] = df['genres'].str.split(',')
+        write_parquet_cache(df, cache_path, db_mtime)
         return df
     except Exception as e:
         st.error(f"Error loading data: {str(e)}")
         return None
 
-def create_genre_chart(df):
-    """Create genre distribution chart"""
-    # Flatten genre lists into a single series
-    all_genres = [genre.strip() for genres in df['genre_list'] for genre in genres if isinstance(genres, list)]
-    genre_counts = pd.Series(all_genres).value_counts()
+@st.cache_data(max_entries=2)
+def load_time_series_data(db_mtime):
+    """Load snapshots for every story that has more than one"""
+    with borrow() as conn:
+        ts_df = pd.read_sql_query(DASHBOARD_TIMESERIES_QUERY, conn)
+    ts_df['snapshot_date'] = pd.to_datetime(ts_df['snapshot_date'], format='ISO8601')
+    return ts_df
+
+@st.cache_data(max_entries=2)
+def load_multi_snapshot_titles(db_mtime):
+    """Load the titles of stories with more than one snapshot"""
+    with borrow() as conn:
+        return [row[0] for row in conn.execute(DASHBOARD_TIMESERIES_TITLES_QUERY)]
+
+@st.cache_data(max_entries=32)
+def load_story_time_series(title, db_mtime):
+    """Load the snapshots of a single story"""
+    with borrow() as conn:
+        story_df = pd.read_sql_query(DASHBOARD_STORY_TIMESERIES_QUERY, conn, params=(title,))
+    story_df['snapshot_date'] = pd.to_datetime(story_df['snapshot_date'], format='ISO8601')
+    return story_df
+
+@st.cache_data(max_entries=2)
+def load_genre_counts(db_mtime):
+    """
+    Load the top genres and their story counts from the genre tables
+    
+    Returns None when the database predates the genre tables; they are created
+    and backfilled the next time the scraper opens it.
+    """
+    try:
+        with borrow() as conn:
+            return pd.read_sql_query(DASHBOARD_GENRE_COUNTS_QUERY, conn, index_col='genre')['stories']
+    except (sqlite3.OperationalError, pd.errors.DatabaseError):
+        return None
+
+# Genre helpers are memoized so widget-triggered reruns skip the split/explode work
+@st.cache_data(ttl=3600)
+def explode_genres(genres):
+    """Split comma-separated genre strings into one stripped genre per row, keeping the story index"""
+    exploded = genres.str.split(',').explode().str.strip()
+    return exploded[exploded.notna() & (exploded != '')]
+
+@st.cache_data(ttl=3600)
+def genre_pair_counts(exploded_genres):
+    """Count how often each unordered pair of genres appears on the same story"""
+    # Sorted integer codes keep code order equal to name order
+    codes, uniques = pd.factorize(exploded_genres, sort=True)
     
+    # explode() keeps each story's genres adjacent, so stories are runs of equal index labels
+    story = exploded_genres.index.to_numpy()
+    starts = np.flatnonzero(np.r_[True, story[1:] != story[:-1]])
+    lengths = np.diff(np.r_[starts, len(story)])
+    
+    # Stories with the same number of genres share one triu_indices pair layout
+    first, second = [np.empty(0, dtype=codes.dtype)], [np.empty(0, dtype=codes.dtype)]
+    for k in np.unique(lengths[lengths > 1]):
+        rows = starts[lengths == k][:, None] + np.arange(k)
+        i, j = np.triu_indices(k, 1)
+        first.append(codes[rows[:, i]].ravel())
+        second.append(codes[rows[:, j]].ravel())
+    first, second = np.concatenate(first), np.concatenate(second)
+    low, high = np.minimum(first, second), np.maximum(first, second)
+    keep = low != high
+    
+    # Tally each (low, high) pair as one integer key
+    keys, counts = np.unique(low[keep].astype(np.int64) * len(uniques) + high[keep], return_counts=True)
+    index = pd.MultiIndex.from_arrays(
+        [uniques[keys // len(uniques)], uniques[keys % len(uniques)]],
+        names=['genre_1', 'genre_2']
+    )
+    return pd.Series(counts, index=index)
+
+@st.cache_data(ttl=3600)
+def create_genre_chart(genre_counts):
+    """Create genre distribution chart from story counts per genre, largest first"""
     # Create horizontal bar chart
     fig = px.bar(
         x=genre_counts.values[:15],
@@ -47,23 +139,15 @@ def create_genre_chart(df):
     fig.update_layout(showlegend=False)
     return fig
 
-def create_genre_combinations_chart(df):
+@st.cache_data(ttl=3600)
+def create_genre_combinations_chart(exploded_genres):
     """Analyze common genre combinations"""
-    genre_pairs = []
-    for genres in df['genre_list']:
-        if isinstance(genres, list) and len(genres) > 1:
-            # Get all possible pairs of genres
-            pairs = [(g1.strip(), g2.strip()) 
-                    for i, g1 in enumerate(genres) 
-                    for g2 in genres[i+1:]]
-            genre_pairs.extend(pairs)
-    
-    pair_counts = pd.Series(genre_pairs).value_counts()
+    pair_counts = genre_pair_counts(exploded_genres).nlargest(10)
     
     # Create horizontal bar chart for top genre combinations
     fig = px.bar(
-        x=pair_counts.values[:10],
-        y=[f"{pair[0]} + {pair[1]}" for pair in pair_counts.index[:10]],
+        x=pair_counts.values,
+        y=[f"{pair[0]} + {pair[1]}" for pair in pair_counts.index],
         orientation='h',
         title='Top 10 Genre Combinations in Trending Stories',
         labels={'x': 'Number of Stories', 'y': 'Genre Combination'}
@@ -75,16 +159,31 @@ def main():
     st.title("📚 Royal Road Trending Stories Analysis")
     
     # Load data
-    df = load_data()
+    db_mtime = get_database_mtime()
+    
+    # The loaders are independent reads, so on a cache miss they run side by side on
+    # pooled read-only connections; WAL lets them proceed even while a scrape writes.
+    # Workers get this session's script context so st.cache_data and st.error work there.
+    ctx = get_script_run_ctx()
+    with ThreadPoolExecutor(max_workers=4, initializer=add_script_run_ctx, initargs=(None, ctx)) as executor:
+        df_future = executor.submit(load_data, db_mtime)
+        genre_counts_future = executor.submit(load_genre_counts, db_mtime)
+        titles_future = executor.submit(load_multi_snapshot_titles, db_mtime)
+        ts_future = executor.submit(load_time_series_data, db_mtime)
+    
+    df = df_future.result()
     if df is None:
         return
     
+    # Explode genres once; the metric and both genre charts share it
+    genres = explode_genres(df['genres'])
+    
     # Display metrics
     col1, col2, col3, col4 = st.columns(4)
     with col1:
         st.metric("Total Stories", len(df))
     with col2:
-        st.metric("Total Genres", len(set([g.strip() for genres in df['genre_list'] for g in genres if isinstance(genres, list)])))
+        st.metric("Total Genres", genres.nunique())
     with col3:
         avg_chapters = int(df['chapters'].mean())
         st.metric("Avg Chapters", avg_chapters)
@@ -96,43 +195,36 @@ def main():
     tab1, tab2, tab3, tab4 = st.tabs(["🎭 Genres", "🔗 Genre Combinations", "📊 Story List", "📈 Time Series"])
     
     with tab1:
-        st.plotly_chart(create_genre_chart(df), width='stretch')
+        genre_counts = genre_counts_future.result()
+        if genre_counts is None:
+            genre_counts = genres.value_counts()
+        st.plotly_chart(create_genre_chart(genre_counts), width='stretch')
     
     with tab2:
-        st.plotly_chart(create_genre_combinations_chart(df), width='stretch')
+        st.plotly_chart(create_genre_combinations_chart(genres), width='stretch')
     
     with tab3:
         # Show story list with genres
         story_df = df[['title', 'genres', 'chapters', 'views', 'snapshot_date']].copy()
-        story_df['views'] = story_df['views'].apply(lambda x: f"{x:,}")
-        story_df['snapshot_date'] = pd.to_datetime(story_df['snapshot_date']).dt.strftime('%Y-%m-%d')
+        story_df['snapshot_date'] = pd.to_datetime(story_df['snapshot_date'], format='ISO8601').dt.strftime('%Y-%m-%d')
         story_df.rename(columns={'snapshot_date': 'Last Updated'}, inplace=True)
-        st.dataframe(story_df, width='stretch')
+        # Keep views numeric and let the frontend add thousands separators
+        st.dataframe(
+            story_df,
+            width='stretch',
+            column_config={'views': st.column_config.NumberColumn(format='localized')}
+        )
         
     with tab4:
         st.subheader("Time Series Analysis")
-        # Create a function to load time series data
-        @st.cache_data
-        def load_time_series_data():
-            db_path = Path(DATABASE_PATH)
-            conn = sqlite3.connect(db_path)
-            ts_df = pd.read_sql_query(DASHBOARD_TIMESERIES_QUERY, conn)
-            conn.close()
-            ts_df['snapshot_date'] = pd.to_datetime(ts_df['snapshot_date'])
-            return ts_df
-            
-        ts_df = load_time_series_data()
-        
-        # Find stories with multiple snapshots
-        story_counts = ts_df.groupby('title')['snapshot_date'].nunique()
-        multi_snapshot_stories = story_counts[story_counts > 1].index.tolist()
+        multi_snapshot_stories = titles_future.result()
         
         if len(multi_snapshot_stories) > 0:
             # Create a dropdown to select a story
             selected_story = st.selectbox("Select a story to see its metrics over time:", multi_snapshot_stories)
             
-            # Filter data for the selected story
-            story_data = ts_df[ts_df['title'] == selected_story]
+            # Load data for the selected story only
+            story_data = load_story_time_series(selected_story, db_mtime)
             
             # Create separate charts for views and followers due to scaling differences
             
@@ -247,48 +339,28 @@ def main():
             # Overall growth trends section
             st.subheader("Overall Growth Trends")
             
-            # Calculate growth for all stories with multiple snapshots
-            growth_data = []
+            # Compare each story's first and last snapshot in one grouped pass
+            ts_df = ts_future.result()
+            grouped = ts_df.sort_values(['title', 'snapshot_date']).groupby('title')
+            first = grouped.head(1).set_index('title')
+            last = grouped.tail(1).set_index('title')
             
-            # For each story with multiple snapshots
-            for story in multi_snapshot_stories:
-                story_data = ts_df[ts_df['title'] == story].sort_values('snapshot_date')
-                
-                # Need at least 2 snapshots
-                if len(story_data) < 2:
-                    continue
-                
-                # Get first and last snapshot
-                first = story_data.iloc[0]
-                last = story_data.iloc[-1]
-                days = (last['snapshot_date'] - first['snapshot_date']).days
-                
-                # Skip if less than 1 day
-                if days < 1:
-                    continue
-                
-                # Calculate metrics
-                views_change = last['views'] - first['views']
-                views_per_day = views_change / days
-                
-                followers_change = last['followers'] - first['followers']
-                followers_per_day = followers_change / days
-                
-                # Add to growth data
-                growth_data.append({
-                    'title': story,
-                    'days': days,
-                    'views_change': views_change,
-                    'views_per_day': views_per_day,
-                    'followers_change': followers_change,
-                    'followers_per_day': followers_per_day,
-                    'initial_views': first['views'],
-                    'initial_followers': first['followers']
-                })
+            growth_df = pd.DataFrame({
+                'days': (last['snapshot_date'] - first['snapshot_date']).dt.days,
+                'views_change': last['views'] - first['views'],
+                'followers_change': last['followers'] - first['followers'],
+                'initial_views': first['views'],
+                'initial_followers': first['followers']
+            })
             
-            if growth_data:
-                growth_df = pd.DataFrame(growth_data)
-                
+            # Skip stories tracked for less than 1 day
+            growth_df = growth_df[growth_df['days'] >= 1].reset_index()
+            growth_df = growth_df.assign(
+                views_per_day=growth_df['views_change'] / growth_df['days'],
+                followers_per_day=growth_df['followers_change'] / growth_df['days']
+            )
+            
+            if not growth_df.empty:
                 # Create scatter plot of growth vs initial popularity
                 metric = st.selectbox("Select Growth Metric:", ["Views", "Followers"])
                 
@@ -311,7 +383,6 @@ def main():
                     ))
                     
                     # Add a trend line using numpy polyfit
-                    import numpy as np
                     z = np.polyfit(growth_df['initial_views'], growth_df['views_per_day'], 1)
                     p = np.poly1d(z)
                     x_range = np.linspace(growth_df['initial_views'].min(), growth_df['initial_views'].max(), 100)
@@ -349,7 +420,6 @@ def main():
                     ))
                     
                     # Add a trend line using numpy polyfit
-                    import numpy as np
                     z = np.polyfit(growth_df['initial_followers'], growth_df['followers_per_day'], 1)
                     p = np.poly1d(z)
                     x_range = np.linspace(growth_df['initial_followers'].min(), growth_df['initial_followers'].max(), 100)
@@ -1,8 +1,167 @@
 import sqlite3
-from typing import List, Dict, Tuple, Optional
+import functools
+import hashlib
+import json
+import logging
+import re
+import queue
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, fields
+from typing import Iterator, List, Dict, Tuple, Optional, Union
 from pathlib import Path
 from config import DATABASE_PATH
 
+logger = logging.getLogger('RoyalRoadDatabase')
+
+# URL format is typically https://www.royalroad.com/fiction/12345/story-title
+_FICTION_ID_RE = re.compile(r'/fiction/(\d+)/')
+
+# Metrics stored in each story snapshot
+SNAPSHOT_METRICS = ('rating', 'followers', 'pages', 'chapters', 'views', 'favorites', 'ratings_count')
+
+# Number of read-only connections kept per database for dashboard/analysis reads
+READ_POOL_SIZE = 5
+
+_read_pools: Dict[str, "queue.Queue[Optional[sqlite3.Connection]]"] = {}
+_read_pools_lock = threading.Lock()
+
+def _open_read_connection(db_path: str) -> sqlite3.Connection:
+    """Open a read-only connection that may be shared across threads"""
+    uri = f"{Path(db_path).resolve().as_uri()}?mode=ro"
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+    # Pooled connections live for the whole process, so give them a large
+    # page cache and memory-mapped reads; WAL mode is set by the writer
+    conn.executescript("""
+        PRAGMA temp_store = MEMORY;
+        PRAGMA cache_size = -65536;
+        PRAGMA mmap_size = 268435456;
+        PRAGMA busy_timeout = 30000;
+    """)
+    return conn
+
+def get_pool(db_path: str = DATABASE_PATH) -> "queue.Queue[Optional[sqlite3.Connection]]":
+    """
+    Get the shared pool of read-only connections for a database
+    
+    Slots start empty and are filled with a connection the first time they
+    are borrowed, so creating the pool never touches the database file.
+    
+    Args:
+        db_path: Path to the SQLite database file
+        
+    Returns:
+        Queue holding up to READ_POOL_SIZE connections
+    """
+    key = str(Path(db_path).resolve())
+    with _read_pools_lock:
+        pool = _read_pools.get(key)
+        if pool is None:
+            pool = queue.Queue(maxsize=READ_POOL_SIZE)
+            for _ in range(READ_POOL_SIZE):
+                pool.put(None)
+            _read_pools[key] = pool
+        return pool
+
+@dataclass(slots=True)
+class Story:
+    """A scraped story: its metadata, current metrics and story page cache entry"""
+    title: Optional[str] = None
+    url: Optional[str] = None
+    genres: Optional[str] = None
+    rating: Optional[float] = None
+    followers: Optional[int] = None
+    pages: Optional[int] = None
+    chapters: Optional[int] = None
+    views: Optional[int] = None
+    favorites: Optional[int] = None
+    ratings_count: Optional[int] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    cached_stats: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Story':
+        """
+        Build a Story from a story dictionary
+        
+        Args:
+            data: Dictionary of story attributes; missing keys become None and unknown keys are ignored
+            
+        Returns:
+            The Story
+        """
+        return cls(**{field.name: data.get(field.name) for field in fields(cls)})
+
+def _as_story(story: Union[Story, Dict]) -> Story:
+    """Accept story dictionaries from older callers alongside Story objects"""
+    return story if isinstance(story, Story) else Story.from_dict(story)
+
+def snapshot_hash(story_data: Story) -> bytes:
+    """
+    Hash the snapshot metrics of a story
+    
+    Equal hashes mean equal metrics, so an unchanged story can be recognised
+    with a single comparison against its latest snapshot.
+    
+    Args:
+        story_data: The story
+        
+    Returns:
+        8-byte BLAKE2b digest of the metric values
+    """
+    values = repr(tuple(getattr(story_data, metric) for metric in SNAPSHOT_METRICS))
+    return hashlib.blake2b(values.encode(), digest_size=8).digest()
+
+def get_database_mtime(db_path: str = DATABASE_PATH) -> int:
+    """
+    Get the latest modification time of a database, including its WAL file
+    
+    Under WAL, commits only touch the -wal file until a checkpoint, so both
+    files are checked. Useful as a cache key for data loaded from the database.
+    
+    Args:
+        db_path: Path to the SQLite database file
+        
+    Returns:
+        Modification time in nanoseconds, or 0 if the database does not exist
+    """
+    mtimes = [0]
+    for path in (Path(db_path), Path(f"{db_path}-wal")):
+        try:
+            mtimes.append(path.stat().st_mtime_ns)
+        except FileNotFoundError:
+            pass
+    return max(mtimes)
+
+@contextmanager
+def borrow(db_path: str = DATABASE_PATH) -> Iterator[sqlite3.Connection]:
+    """
+    Borrow a pooled read-only connection, blocking while all are in use
+    
+    Args:
+        db_path: Path to the SQLite database file
+        
+    Yields:
+        A read-only sqlite3 connection that is returned to the pool on exit
+    """
+    pool = get_pool(db_path)
+    conn = pool.get()
+    try:
+        if conn is None:
+            conn = _open_read_connection(db_path)
+        yield conn
+    finally:
+        pool.put(conn)
+
+def _synchronized(method):
+    """Run a RoyalRoadDatabase method while holding its connection lock"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
 class RoyalRoadDatabase:
     """Database manager for Royalroad story data"""
 
@@ -15,15 +174,30 @@ class RoyalRoadDatabase:
         self.db_path = db_path
         self.conn = None  # type: ignore
         self.cursor = None  # type: ignore
+        # The connection and its shared cursor may be used from several threads,
+        # so public methods take this lock to serialize statements and commits
+        self._lock = threading.RLock()
         self._connect()
         self._create_tables()
 
     def _connect(self):
         """Establish database connection"""
         Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
-        self.conn = sqlite3.connect(self.db_path)
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
         self.cursor = self.conn.cursor()
 
+        # WAL lets readers (dashboard, notebook) run alongside a scrape and only
+        # fsyncs at checkpoints; the -wal/-shm files live next to the database
+        self.cursor.executescript("""
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            PRAGMA temp_store = MEMORY;
+            PRAGMA cache_size = -65536;
+            PRAGMA mmap_size = 268435456;
+            PRAGMA foreign_keys = ON;
+            PRAGMA busy_timeout = 30000;
+        """)
+
     def _create_tables(self):
         """Create database tables if they do not exist"""
 
@@ -36,10 +210,16 @@ class RoyalRoadDatabase:
                 url TEXT,
                 genres TEXT,
                 first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                etag TEXT,
+                last_modified TEXT,
+                cached_stats TEXT
             );
         """)
 
+        # Add the story page cache columns to databases created before they existed
+        self._add_missing_columns('stories', {'etag': 'TEXT', 'last_modified': 'TEXT', 'cached_stats': 'TEXT'})
+
         # Story Snapshots table - stores historical metrics for each story
         self.cursor.execute("""
             CREATE TABLE IF NOT EXISTS story_snapshots (
@@ -53,9 +233,35 @@ class RoyalRoadDatabase:
                 views INTEGER,
                 favorites INTEGER,
                 ratings_count INTEGER,
+                content_hash BLOB,
                 FOREIGN KEY (story_id) REFERENCES stories(id)
             );
         """)
+        self._add_missing_columns('story_snapshots', {'content_hash': 'BLOB'})
+
+        # Latest snapshot of each story, kept current by a trigger so readers
+        # look it up directly instead of ranking the whole snapshot history
+        self.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS latest_snapshots (
+                story_id INTEGER PRIMARY KEY,
+                snapshot_id INTEGER NOT NULL,
+                snapshot_date TIMESTAMP,
+                FOREIGN KEY (story_id) REFERENCES stories(id),
+                FOREIGN KEY (snapshot_id) REFERENCES story_snapshots(id)
+            );
+        """)
+        self.cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_story_snapshots_latest
+            AFTER INSERT ON story_snapshots
+            BEGIN
+                INSERT INTO latest_snapshots (story_id, snapshot_id, snapshot_date)
+                VALUES (NEW.story_id, NEW.id, NEW.snapshot_date)
+                ON CONFLICT (story_id) DO UPDATE SET
+                    snapshot_id = excluded.snapshot_id,
+                    snapshot_date = excluded.snapshot_date
+                WHERE excluded.snapshot_date >= latest_snapshots.snapshot_date;
+            END
+        """)
 
         # Create scrape_history table
         self.cursor.execute("""
@@ -70,6 +276,24 @@ class RoyalRoadDatabase:
             );
         """)
 
+        # Genre tables - one row per genre name and one per story/genre pair, so
+        # genre aggregations run in SQLite instead of splitting stories.genres
+        self.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS genres (
+                id INTEGER PRIMARY KEY,
+                name TEXT UNIQUE
+            );
+        """)
+        self.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS story_genres (
+                story_id INTEGER,
+                genre_id INTEGER,
+                PRIMARY KEY (story_id, genre_id),
+                FOREIGN KEY (story_id) REFERENCES stories(id),
+                FOREIGN KEY (genre_id) REFERENCES genres(id)
+            ) WITHOUT ROWID;
+        """)
+
         # Create indexes for performance
         self.cursor.execute("""
             CREATE INDEX IF NOT EXISTS idx_stories_royal_road_id ON stories(royal_road_id)
@@ -78,24 +302,67 @@ class RoyalRoadDatabase:
             CREATE INDEX IF NOT EXISTS idx_stories_url ON stories(url)
         """)
         self.cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_story_snapshots_story_id ON story_snapshots(story_id)
+            CREATE INDEX IF NOT EXISTS idx_story_snapshots_date ON story_snapshots(snapshot_date)
         """)
+        # Per-story history in date order, carrying the dashboard's metric columns
+        # so latest-snapshot lookups never have to visit the table itself
         self.cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_story_snapshots_date ON story_snapshots(snapshot_date)
+            CREATE INDEX IF NOT EXISTS idx_story_snapshots_story_latest
+            ON story_snapshots(story_id, snapshot_date DESC, rating, followers, chapters, views, favorites)
         """)
+        # Indexes from older schemas that no query uses (or that the index above
+        # already covers); each one was updated on every snapshot insert
+        for index_name in ('idx_story_snapshots_story_id', 'idx_story_snapshots_story_date',
+                           'idx_story_snapshots_rating', 'idx_story_snapshots_followers',
+                           'idx_story_snapshots_views'):
+            self.cursor.execute(f"DROP INDEX IF EXISTS {index_name}")
         self.cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_story_snapshots_rating ON story_snapshots(rating)
+            CREATE INDEX IF NOT EXISTS idx_story_genres_genre_id ON story_genres(genre_id)
         """)
+
+        # Backfill genre rows for stories saved before the genre tables existed
         self.cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_story_snapshots_followers ON story_snapshots(followers)
+            SELECT id, genres FROM stories
+            WHERE genres IS NOT NULL
+              AND id NOT IN (SELECT story_id FROM story_genres)
         """)
+        self._sync_genres(self.cursor.fetchall())
+
+        # Backfill latest snapshots for stories saved before the table existed
         self.cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_story_snapshots_views ON story_snapshots(views)
+            INSERT INTO latest_snapshots (story_id, snapshot_id, snapshot_date)
+            SELECT story_id, id, snapshot_date FROM (
+                SELECT story_id, id, snapshot_date,
+                       ROW_NUMBER() OVER (PARTITION BY story_id ORDER BY snapshot_date DESC, id DESC) AS rn
+                FROM story_snapshots
+                WHERE story_id NOT IN (SELECT story_id FROM latest_snapshots)
+            )
+            WHERE rn = 1
         """)
 
+        # Gather planner statistics that are missing or stale, so queries such as
+        # the per-story snapshot counts pick the right index from the start. The
+        # 0x10000 flag (SQLite 3.46+, ignored before) checks every table, which is
+        # cheap when nothing changed; close() keeps the statistics current after that
+        self.cursor.execute("PRAGMA optimize = 0x10002")
+
         self.conn.commit()
         print("Database tables created or verified.")
 
+    def _add_missing_columns(self, table: str, columns: Dict[str, str]):
+        """
+        Add columns that a table created by an older version is missing
+        
+        Args:
+            table: Name of the table
+            columns: Dictionary mapping column name to its SQL type
+        """
+        self.cursor.execute(f"PRAGMA table_info({table})")
+        existing = {row[1] for row in self.cursor.fetchall()}
+        for column, column_type in columns.items():
+            if column not in existing:
+                self.cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
     def _extract_royal_road_id(self, url: Optional[str]) -> Optional[int]:
         """
         Extract the RoyalRoad story ID from a URL
@@ -109,186 +376,365 @@ class RoyalRoadDatabase:
         if not url:
             return None
             
-        import re
-        # URL format is typically https://www.royalroad.com/fiction/12345/story-title
-        match = re.search(r'/fiction/(\d+)/', url)
-        if match:
-            try:
-                return int(match.group(1))
-            except ValueError:
-                print(f"Could not convert story ID to integer: {match.group(1)}")
-                return None
-        return None
+        match = _FICTION_ID_RE.search(url)
+        return int(match.group(1)) if match else None
         
-    def insert_story(self, story_data: Dict) -> Tuple[Optional[int], bool]:
+    def _sync_genres(self, story_genres: List[Tuple[int, Optional[str]]]):
         """
-        Insert a single story into the database and create a snapshot of its current metrics
+        Replace the story_genres rows of each story with its current genres
+        
+        Does not commit; callers run this inside their own transaction.
         
         Args:
-            story_data: Dictionary containing story attributes
-            
+            story_genres: List of (story_id, comma-separated genres) tuples
+        """
+        if not story_genres:
+            return
+        
+        pairs = [
+            (story_id, name)
+            for story_id, genres in story_genres
+            for name in {g.strip() for g in (genres or '').split(',')}
+            if name
+        ]
+        
+        self.cursor.executemany(
+            "DELETE FROM story_genres WHERE story_id = ?",
+            [(story_id,) for story_id, _ in story_genres]
+        )
+        self.cursor.executemany(
+            "INSERT OR IGNORE INTO genres (name) VALUES (?)",
+            [(name,) for name in {name for _, name in pairs}]
+        )
+        self.cursor.executemany("""
+            INSERT OR IGNORE INTO story_genres (story_id, genre_id)
+            SELECT ?, id FROM genres WHERE name = ?
+        """, pairs)
+
+    def _store_page_cache(self, stories: List[Tuple[int, Story]]):
+        """
+        Save the HTTP validators and parsed stats of freshly fetched story pages
+        
+        Stories without 'cached_stats' (not fetched, or answered with 304) are
+        left as they are. Does not commit.
+        
+        Args:
+            stories: List of (story_id, story) tuples
+        """
+        self.cursor.executemany("""
+            UPDATE stories SET etag = ?, last_modified = ?, cached_stats = ?
+            WHERE id = ?
+        """, [
+            (story.etag, story.last_modified, story.cached_stats, story_id)
+            for story_id, story in stories
+            if story.cached_stats is not None
+        ])
+
+    @_synchronized
+    def get_page_cache(self) -> Dict[str, Dict]:
+        """
+        Get the cached story page validators and stats, keyed by story URL
+        
         Returns:
-            Tuple of (story_id, is_new): ID of the inserted story and whether it was a new insert
+            Dictionary mapping url to a dict with etag, last_modified and stats
         """
         try:
-            # Extract Royal Road ID from URL
-            royal_road_id = self._extract_royal_road_id(story_data.get('url'))
-            
-            # Skip if we can't get a Royal Road ID
-            if royal_road_id is None:
-                print(f"Skipping story with invalid URL: {story_data.get('url')}")
-                return (None, False)
-                
-            # Check if story exists by Royal Road ID first
-            self.cursor.execute("SELECT id FROM stories WHERE royal_road_id = ?", (royal_road_id,))
-            existing = self.cursor.fetchone()
-            
-            is_new = existing is None
-            
-            if is_new:
-                # Insert new story
-                self.cursor.execute("""
-                    INSERT INTO stories (royal_road_id, title, url, genres, first_seen, last_updated)
-                    VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-                """, (
-                    royal_road_id,
-                    story_data.get('title'),
-                    story_data.get('url'),
-                    story_data.get('genres')
-                ))
-                
-                # Get story ID
-                story_id = self.cursor.execute(
-                    "SELECT last_insert_rowid();"
-                ).fetchone()[0]
-            else:
-                # Update existing story's metadata and last_updated timestamp
-                story_id = existing[0]
-                self.cursor.execute("""
-                    UPDATE stories 
-                    SET title = ?, url = ?, genres = ?, last_updated = CURRENT_TIMESTAMP
-                    WHERE id = ?
-                """, (
-                    story_data.get('title'),
-                    story_data.get('url'),
-                    story_data.get('genres'),
-                    story_id
-                ))
+            self.cursor.execute("""
+                SELECT url, etag, last_modified, cached_stats FROM stories
+                WHERE cached_stats IS NOT NULL
+            """)
+            return {
+                url: {'etag': etag, 'last_modified': last_modified, 'stats': json.loads(cached_stats)}
+                for url, etag, last_modified, cached_stats in self.cursor.fetchall()
+            }
+        except sqlite3.Error as e:
+            print(f"Error loading page cache: {e}")
+            return {}
+
+    def _insert_story_nocommit(self, story_data: Story, royal_road_id: int) -> Tuple[int, bool]:
+        """
+        Write a story and a snapshot of its current metrics without committing
+        
+        The caller owns the transaction and is responsible for committing or
+        rolling back; sqlite3.Error is propagated.
+        
+        Args:
+            story_data: The story to write
+            royal_road_id: Royal Road story ID extracted from the story URL
             
-            # Always insert a new snapshot with the current metrics
+        Returns:
+            Tuple of (story_id, is_new): ID of the story and whether it was a new insert
+        """
+        # Update the story in place if it is already stored; RETURNING hands back
+        # its id, so stories seen before need a single statement
+        self.cursor.execute("""
+            UPDATE stories 
+            SET title = ?, url = ?, genres = ?, last_updated = CURRENT_TIMESTAMP
+            WHERE royal_road_id = ?
+            RETURNING id
+        """, (
+            story_data.title,
+            story_data.url,
+            story_data.genres,
+            royal_road_id
+        ))
+        row = self.cursor.fetchone()
+        is_new = row is None
+        
+        if is_new:
             self.cursor.execute("""
-                INSERT INTO story_snapshots 
-                (story_id, snapshot_date, rating, followers, pages, chapters, views, favorites, ratings_count)
-                VALUES (?, CURRENT_TIMESTAMP, ?, ?, ?, ?, ?, ?, ?)
+                INSERT INTO stories (royal_road_id, title, url, genres, first_seen, last_updated)
+                VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+                RETURNING id
             """, (
-                story_id,
-                story_data.get('rating'),
-                story_data.get('followers'),
-                story_data.get('pages'),
-                story_data.get('chapters'),
-                story_data.get('views'),
-                story_data.get('favorites'),
-                story_data.get('ratings_count')
+                royal_road_id,
+                story_data.title,
+                story_data.url,
+                story_data.genres
             ))
+            story_id = self.cursor.fetchone()[0]
+        else:
+            story_id = row[0]
+        
+        # Always insert a new snapshot with the current metrics
+        self.cursor.execute("""
+            INSERT INTO story_snapshots 
+            (story_id, snapshot_date, rating, followers, pages, chapters, views, favorites, ratings_count, content_hash)
+            VALUES (?, CURRENT_TIMESTAMP, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            story_id,
+            story_data.rating,
+            story_data.followers,
+            story_data.pages,
+            story_data.chapters,
+            story_data.views,
+            story_data.favorites,
+            story_data.ratings_count,
+            snapshot_hash(story_data)
+        ))
+
+        self._sync_genres([(story_id, story_data.genres)])
+        self._store_page_cache([(story_id, story_data)])
 
-            self.conn.commit()
-            return (story_id, is_new)
+        return (story_id, is_new)
+
+    @_synchronized
+    def insert_story(self, story_data: Union[Story, Dict]) -> Tuple[Optional[int], bool]:
+        """
+        Insert a single story into the database and create a snapshot of its current metrics
+        
+        Args:
+            story_data: The story, or a dictionary containing story attributes
+            
+        Returns:
+            Tuple of (story_id, is_new): ID of the inserted story and whether it was a new insert
+        """
+        story_data = _as_story(story_data)
+        
+        # Extract Royal Road ID from URL
+        royal_road_id = self._extract_royal_road_id(story_data.url)
+        
+        # Skip if we can't get a Royal Road ID
+        if royal_road_id is None:
+            print(f"Skipping story with invalid URL: {story_data.url}")
+            return (None, False)
+        
+        try:
+            # Commits on success and rolls back a half-written story on error
+            with self.conn:
+                return self._insert_story_nocommit(story_data, royal_road_id)
         
         except sqlite3.Error as e:
             print(f"Error inserting story: {e}")
             return (None, False)
         
-    def insert_stories_bulk(self, stories: List[Dict]) -> Tuple[int, int]:
+    @_synchronized
+    def insert_stories_bulk(self, stories: List[Union[Story, Dict]]) -> Tuple[int, int]:
         """
         Insert multiple stories at once
         
+        The batch is staged in a TEMP table with one executemany, then SQLite
+        works out which stories are new or changed and writes the stories and
+        their snapshots with set-based statements in a single transaction,
+        instead of one insert_story call per row.
+        
         Args:
-            stories: List of story data dictionaries
+            stories: List of stories (Story objects or story data dictionaries)
             
         Returns:
             Tuple of (stories_added, stories_updated)
         """
 
-        added = 0
-        updated = 0
-
-        # Get all existing Royal Road IDs first
-        self.cursor.execute("SELECT id, royal_road_id FROM stories")
-        existing_ids = {row[1]: row[0] for row in self.cursor.fetchall() if row[1] is not None}
-        
-        # Print current database state
-        print(f"\nBefore update:")
-        print(f"Total stories in database: {len(existing_ids)}")
-
-        for story in stories:
-            # Extract Royal Road ID from URL
-            royal_road_id = self._extract_royal_road_id(story.get('url'))
+        # Key the batch by Royal Road ID so each story is written once
+        batch: Dict[int, Story] = {}
+        for story in map(_as_story, stories):
+            royal_road_id = self._extract_royal_road_id(story.url)
             if not royal_road_id:
-                print(f"Skipping story with invalid URL: {story.get('url')}")
+                logger.warning("Skipping story with invalid URL: %s", story.url)
                 continue
-                
-            if royal_road_id in existing_ids:
-                # Check if we need to create a new snapshot by comparing with the most recent one
-                story_id = existing_ids[royal_road_id]
+            batch[royal_road_id] = story
+
+        # Table-wide counts scale with the database, not the batch, so only run them when debugging
+        if logger.isEnabledFor(logging.DEBUG):
+            self.cursor.execute("SELECT COUNT(*) FROM stories")
+            logger.debug("Total stories in database before update: %s", self.cursor.fetchone()[0])
+
+        try:
+            self.cursor.execute("DROP TABLE IF EXISTS temp.staging_stories")
+            self.cursor.execute("""
+                CREATE TEMP TABLE staging_stories (
+                    royal_road_id INTEGER PRIMARY KEY,
+                    story_id INTEGER,
+                    is_new INTEGER DEFAULT 0,
+                    changed INTEGER DEFAULT 1,
+                    title TEXT,
+                    url TEXT,
+                    genres TEXT,
+                    rating REAL,
+                    followers INTEGER,
+                    pages INTEGER,
+                    chapters INTEGER,
+                    views INTEGER,
+                    favorites INTEGER,
+                    ratings_count INTEGER,
+                    content_hash BLOB,
+                    etag TEXT,
+                    last_modified TEXT,
+                    cached_stats TEXT
+                )
+            """)
+
+            # One transaction for the whole batch: commits on success, rolls back on error
+            with self.conn:
+                self.cursor.executemany("""
+                    INSERT INTO staging_stories (
+                        royal_road_id, title, url, genres, rating, followers, pages, chapters,
+                        views, favorites, ratings_count, content_hash, etag, last_modified, cached_stats
+                    )
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, [
+                    (
+                        royal_road_id,
+                        story.title,
+                        story.url,
+                        story.genres,
+                        story.rating,
+                        story.followers,
+                        story.pages,
+                        story.chapters,
+                        story.views,
+                        story.favorites,
+                        story.ratings_count,
+                        snapshot_hash(story),
+                        story.etag,
+                        story.last_modified,
+                        story.cached_stats
+                    )
+                    for royal_road_id, story in batch.items()
+                ])
+
+                # Resolve the stories already stored
                 self.cursor.execute("""
-                    SELECT rating, followers, chapters, views, favorites 
-                    FROM story_snapshots 
-                    WHERE story_id = ? 
-                    ORDER BY snapshot_date DESC 
-                    LIMIT 1
-                """, (story_id,))
-                
-                current = self.cursor.fetchone()
-                if current:
-                    old_vals = dict(zip(['rating', 'followers', 'chapters', 'views', 'favorites'], current))
-                    new_vals = {k: story.get(k) for k in old_vals.keys()}
-                    # Only insert a new snapshot if values actually changed
-                    if any(old_vals[k] != new_vals[k] for k in old_vals.keys() if new_vals[k] is not None):
-                        result = self.insert_story(story)
-                        if result[0]:  # If update was successful
-                            updated += 1
-                else:
-                    # No snapshots exist yet, create one
-                    result = self.insert_story(story)
-                    if result[0]:
-                        updated += 1
-            else:
-                # This is a new story, add it
-                result = self.insert_story(story)
-                if result[0]:  # If insert was successful
-                    added += 1
-                    existing_ids[royal_road_id] = result[0]  # Store the new ID
+                    UPDATE staging_stories SET story_id = s.id
+                    FROM stories s
+                    WHERE s.royal_road_id = staging_stories.royal_road_id
+                """)
+                self.cursor.execute("UPDATE staging_stories SET is_new = 1 WHERE story_id IS NULL")
 
-        self.conn.commit()
+                # A stored story is unchanged when its hash matches the latest snapshot, or
+                # when every metric it reports (missing ones are ignored) equals the latest value
+                self.cursor.execute("""
+                    UPDATE staging_stories SET changed = 0
+                    FROM (
+                        SELECT ls.story_id, ss.content_hash, ss.rating, ss.followers, ss.chapters, ss.views, ss.favorites
+                        FROM latest_snapshots ls
+                        JOIN story_snapshots ss ON ss.id = ls.snapshot_id
+                        WHERE ls.story_id IN (SELECT story_id FROM staging_stories)
+                    ) AS latest
+                    WHERE latest.story_id = staging_stories.story_id
+                      AND (
+                          latest.content_hash IS staging_stories.content_hash
+                          OR NOT (
+                              (staging_stories.rating IS NOT NULL AND staging_stories.rating IS NOT latest.rating)
+                              OR (staging_stories.followers IS NOT NULL AND staging_stories.followers IS NOT latest.followers)
+                              OR (staging_stories.chapters IS NOT NULL AND staging_stories.chapters IS NOT latest.chapters)
+                              OR (staging_stories.views IS NOT NULL AND staging_stories.views IS NOT latest.views)
+                              OR (staging_stories.favorites IS NOT NULL AND staging_stories.favorites IS NOT latest.favorites)
+                          )
+                      )
+                """)
 
-        # Print detailed results
-        print(f"\nScrape Results:")
-        self.cursor.execute("SELECT COUNT(*) FROM stories")
-        total_stories = self.cursor.fetchone()[0]
-        print(f"Total stories in database now: {total_stories}")
+                # Insert new stories, then resolve their ids; kept apart from the update
+                # so stored stories never consume AUTOINCREMENT ids the way an UPSERT does
+                self.cursor.execute("""
+                    INSERT INTO stories (royal_road_id, title, url, genres, first_seen, last_updated)
+                    SELECT royal_road_id, title, url, genres, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP
+                    FROM staging_stories
+                    WHERE is_new
+                """)
+                self.cursor.execute("""
+                    UPDATE staging_stories SET story_id = s.id
+                    FROM stories s
+                    WHERE staging_stories.is_new AND s.royal_road_id = staging_stories.royal_road_id
+                """)
+
+                # Refresh metadata of changed stories and write their snapshots
+                self.cursor.execute("""
+                    UPDATE stories
+                    SET title = t.title, url = t.url, genres = t.genres, last_updated = CURRENT_TIMESTAMP
+                    FROM staging_stories t
+                    WHERE t.story_id = stories.id AND t.changed AND NOT t.is_new
+                """)
+                self.cursor.execute("""
+                    INSERT INTO story_snapshots 
+                    (story_id, snapshot_date, rating, followers, pages, chapters, views, favorites, ratings_count, content_hash)
+                    SELECT story_id, CURRENT_TIMESTAMP, rating, followers, pages, chapters, views, favorites, ratings_count, content_hash
+                    FROM staging_stories
+                    WHERE changed
+                """)
+
+                self.cursor.execute("SELECT story_id, genres FROM staging_stories WHERE changed")
+                self._sync_genres(self.cursor.fetchall())
+
+                # Page validators change even when the metrics don't, so save them for every story
+                self.cursor.execute("""
+                    UPDATE stories SET etag = t.etag, last_modified = t.last_modified, cached_stats = t.cached_stats
+                    FROM staging_stories t
+                    WHERE t.story_id = stories.id AND t.cached_stats IS NOT NULL
+                """)
+
+                self.cursor.execute("""
+                    SELECT COALESCE(SUM(changed AND is_new), 0), COALESCE(SUM(changed AND NOT is_new), 0)
+                    FROM staging_stories
+                """)
+                added, updated = self.cursor.fetchone()
+
+        except sqlite3.Error as e:
+            print(f"Error inserting stories: {e}")
+            return (0, 0)
+
+        finally:
+            self.cursor.execute("DROP TABLE IF EXISTS temp.staging_stories")
+
+        logger.info(
+            "Scrape results: %s stories scraped this run, %s new stories added, %s existing stories updated",
+            len(stories), added, updated
+        )
         
-        self.cursor.execute("SELECT COUNT(*) FROM story_snapshots")
-        total_snapshots = self.cursor.fetchone()[0]
-        print(f"Total snapshots in database: {total_snapshots}")
+        if logger.isEnabledFor(logging.DEBUG):
+            self._log_database_summary()
         
-        print(f"Stories scraped this run: {len(stories)}")
-        print(f"New stories added: {added}")
-        print(f"Existing stories updated: {updated}")
+        return (added, updated)
+    
+    def _log_database_summary(self):
+        """Log table-wide counts and the most recent ratings at DEBUG level"""
+        self.cursor.execute("SELECT COUNT(*) FROM stories")
+        logger.debug("Total stories in database now: %s", self.cursor.fetchone()[0])
         
-        # Count stories with ratings in the latest snapshots
-        self.cursor.execute("""
-            SELECT COUNT(*) FROM (
-                SELECT s.id
-                FROM stories s
-                JOIN story_snapshots ss ON s.id = ss.story_id
-                WHERE ss.rating IS NOT NULL
-                GROUP BY s.id
-            )
-        """)
-        stories_with_ratings = self.cursor.fetchone()[0]
-        print(f"Stories with ratings: {stories_with_ratings}")
+        self.cursor.execute("SELECT COUNT(*) FROM story_snapshots")
+        logger.debug("Total snapshots in database: %s", self.cursor.fetchone()[0])
         
-        # Get some sample ratings from the most recent snapshots
+        # Get some sample ratings from the most recent snapshots (served by idx_story_snapshots_date)
         self.cursor.execute("""
             SELECT s.title, ss.rating, ss.snapshot_date 
             FROM stories s
@@ -297,14 +743,10 @@ class RoyalRoadDatabase:
             ORDER BY ss.snapshot_date DESC 
             LIMIT 5
         """)
-        samples = self.cursor.fetchall()
-        if samples:
-            print("\nMost Recent Story Ratings:")
-            for title, rating, date in samples:
-                print(f"{title}: {rating} (Scraped: {date})")
-        
-        return (added, updated)
-    
+        for title, rating, date in self.cursor.fetchall():
+            logger.debug("Recent rating - %s: %s (Scraped: %s)", title, rating, date)
+
+    @_synchronized
     def log_scrape(self, pages_scraped: int, stories_added: int, stories_updated: int, 
                    status: str = "success", notes: Optional[str] = None):
         """
@@ -319,26 +761,33 @@ class RoyalRoadDatabase:
         """
 
         try:
-            self.cursor.execute("""
-                INSERT INTO scrape_history (pages_scraped, stories_added, stories_updated, status, notes)
-                VALUES (?, ?, ?, ?, ?);
-            """, (pages_scraped, stories_added, stories_updated, status, notes))
+            with self.conn:
+                self.cursor.execute("""
+                    INSERT INTO scrape_history (pages_scraped, stories_added, stories_updated, status, notes)
+                    VALUES (?, ?, ?, ?, ?);
+                """, (pages_scraped, stories_added, stories_updated, status, notes))
 
-            self.conn.commit()
             print("Scrape session logged.")
         
         except sqlite3.Error as e:
             print(f"Error logging scrape session: {e}")
 
+    @_synchronized
     def close(self):
         """Close database connection."""
         if self.conn:
+            try:
+                # Refresh query planner statistics for tables this session changed
+                self.conn.execute("PRAGMA optimize")
+            except sqlite3.Error as e:
+                print(f"Error optimizing database: {e}")
             self.conn.close()
 
     def __enter__(self):
         """Context manager entry."""
         return self
 
+    @_synchronized
     def get_snapshot_count(self) -> int:
         """
         Get the total number of snapshots in the database
@@ -0,0 +1,97 @@
+"""
+Text-to-number helpers used on every page the scraper parses.
+
+This module is fully type-annotated and sticks to plain str/int/float
+operations so it can be compiled to a C extension with mypyc:
+
+    pip install mypy
+    mypyc parsing.py
+
+The compiled module is picked up in place of this file automatically;
+without a compiler the pure-Python version is used unchanged.
+"""
+
+import re
+from typing import Optional
+
+_NUM_RE = re.compile(r'[\d,\.]+')
+_RATING_RE = re.compile(r'([0-9.]+)')
+_LIST_RATING_RE = re.compile(r'([0-9.]+)\s*/\s*5')
+
+
+def parse_number(text: str) -> Optional[int]:
+    """
+    Parse a number from text, handling K/M suffixes.
+
+    Args:
+        text: Text containing a number (e.g., "1.2K", "3M", "500", "1,234 Followers")
+
+    Returns:
+        Parsed number or None if parsing fails
+    """
+    if not text:
+        return None
+
+    # Plain counts like "1,234" are by far the most common input, and need
+    # neither the regex nor the suffix handling
+    digits = text.replace(',', '')
+    if digits.isascii() and digits.isdigit():
+        return int(digits)
+
+    # Extract number part using regex
+    number_match = _NUM_RE.search(text)
+    if not number_match:
+        return None
+
+    # Handle K/M suffixes
+    multiplier = 1
+    upper_text = text.upper()
+    if 'K' in upper_text:
+        multiplier = 1000
+    elif 'M' in upper_text:
+        multiplier = 1000000
+
+    # Remove commas and convert to float
+    try:
+        clean_number = float(number_match.group(0).replace(',', ''))
+    except ValueError:
+        return None
+    return int(clean_number * multiplier)
+
+
+def parse_rating(text: str) -> Optional[float]:
+    """
+    Parse a rating from a story page label such as "4.83 stars".
+
+    Args:
+        text: The aria-label or data-content of the rating span
+
+    Returns:
+        The rating, or None if no rating could be read
+    """
+    rating_match = _RATING_RE.search(text)
+    if not rating_match:
+        return None
+    try:
+        return float(rating_match.group(1))
+    except ValueError:
+        return None
+
+
+def parse_list_rating(text: str) -> Optional[float]:
+    """
+    Parse a rating from a trending page label such as "4.5 / 5".
+
+    Args:
+        text: Text of the rating span
+
+    Returns:
+        The rating, or None if no rating could be read
+    """
+    rating_match = _LIST_RATING_RE.search(text)
+    if not rating_match:
+        return None
+    try:
+        return float(rating_match.group(1))
+    except ValueError:
+        return None
@@ -1,28 +1,101 @@
 import requests
-from bs4 import BeautifulSoup, Tag
+from requests.adapters import DEFAULT_POOLSIZE, HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+from bs4 import BeautifulSoup, SoupStrainer, Tag
+import soupsieve as sv
+from lxml import etree
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional, Tuple, Union
 import re
+import json
 import logging
 from pathlib import Path
-from database import RoyalRoadDatabase
+from database import RoyalRoadDatabase, Story
 from config import BASE_URL, HEADERS, DATABASE_PATH
+from parsing import parse_number, parse_rating, parse_list_rating
+
+# Patterns are compiled once here rather than looked up on every parse
+_FICTION_LIST_ITEM_RE = re.compile(r'fiction-list-item')
+
+# Story page stat labels and the keys they are stored under
+STAT_LABELS = (
+    ('Total Views', 'views'),
+    ('Followers', 'followers'),
+    ('Favorites', 'favorites'),
+    ('Ratings', 'ratings_count'),
+    ('Chapters', 'chapters'),
+    ('Pages', 'pages')
+)
+
+# CSS selectors for trending page items, compiled once
+_TITLE_SEL = sv.compile('h2.fiction-title a')
+_STATS_SPAN_SEL = sv.compile('div.stats span')
+_LIST_RATING_SEL = sv.compile('div.stats span.font-red-sunglo')
+_TAG_SEL = sv.compile('span.tags a.label')
+
+# Only build the story entries of the trending page; strainers see the raw
+# class attribute string, so multi-class tags need a regex
+LIST_PAGE_STRAINER = SoupStrainer('div', class_=_FICTION_LIST_ITEM_RE)
+
+# Bytes read per chunk while streaming a story page into the parser
+STREAM_CHUNK_SIZE = 16384
+
+def _element_text(element: etree._Element) -> str:
+    """Join an element's text nodes with each one stripped, like get_text(strip=True)."""
+    return ''.join(text.strip() for text in element.itertext())
+
+class RateLimiter:
+    """Space out request start times across threads by a fixed interval"""
+
+    def __init__(self, interval: float):
+        """Initialize the limiter.
+
+        Args:
+            interval: Minimum time between two request starts in seconds
+        """
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._next_start = 0.0
+
+    def wait(self):
+        """Block until the caller may start its request."""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self.interval
+        if start > now:
+            time.sleep(start - now)
 
 class RoyalRoadScraper:
     """Scraper for RoyalRoad stories and chapters"""
 
-    def __init__(self, delay: float = 1.5, log_level: int = logging.DEBUG):
+    def __init__(self, delay: float = 1.5, log_level: int = logging.DEBUG, max_workers: int = 8):
         """Initialize the scraper with delay and logging configuration.
 
         Args:
-            delay: Delay between requests in seconds
+            delay: Minimum delay between request starts in seconds, shared by all workers
             log_level: Logging level (default: logging.DEBUG)
+            max_workers: Number of story pages fetched concurrently
         """
         self.BASE_URL = BASE_URL
         self.HEADERS = HEADERS
         self.delay = delay
+        self.max_workers = max_workers
+        self.rate_limiter = RateLimiter(delay)
+        # Story page validators and stats keyed by URL, loaded from the database
+        # by scrape_top_stories so unchanged pages can be answered with 304
+        self.page_cache: Dict[str, Dict] = {}
         self.session = requests.Session()
         self.session.headers.update(self.HEADERS)
+        # Advertise every encoding urllib3 can decode, including br with brotli installed
+        self.session.headers['Accept-Encoding'] = ACCEPT_ENCODING
+        # Keep at least one keep-alive connection per worker, so more than
+        # DEFAULT_POOLSIZE workers don't open and drop connections on every fetch
+        adapter = HTTPAdapter(pool_maxsize=max(max_workers, DEFAULT_POOLSIZE))
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
         
         # Configure logging
         self.logger = logging.getLogger('RoyalRoadScraper')
@@ -45,55 +118,136 @@ class RoyalRoadScraper:
                 self.logger.addHandler(file_handler)
             except Exception:
                 self.logger.warning("Could not create log file, continuing with console logging only")
+        
+        # Send the database's scrape results and diagnostics to the same handlers
+        db_logger = logging.getLogger('RoyalRoadDatabase')
+        db_logger.setLevel(log_level)
+        if not db_logger.handlers:
+            for handler in self.logger.handlers:
+                db_logger.addHandler(handler)
     
-    def _extract_story_stats(self, soup: BeautifulSoup) -> Dict[str, Union[int, float]]:
-        """Extract statistics from a story page.
+    def _fetch(self, url: str, headers: Optional[Dict[str, str]] = None, stream: bool = False) -> requests.Response:
+        """Fetch a page once the shared rate limiter allows it.
+
+        Args:
+            url: Full URL of the page
+            headers: Extra request headers, e.g. conditional request validators
+            stream: Leave the body unread so it can be consumed in chunks
+
+        Returns:
+            The response, after raising for error status codes
+        """
+        self.rate_limiter.wait()
+        self.logger.debug("Fetching page %s", url)
+        response = self.session.get(url, headers=headers, timeout=10, stream=stream)
+        response.raise_for_status()
+        return response
+
+    def _extract_story_stats(self, stats_container: etree._Element) -> Dict[str, Union[int, float]]:
+        """Extract statistics from the stats block of a story page.
         
         Args:
-            soup: BeautifulSoup object of the story page
+            stats_container: The 'portlet-body fiction-stats' div element
             
         Returns:
             Dictionary containing story statistics with keys: followers, pages, views, chapters
         """
         stats: Dict[str, Union[int, float]] = {}
-        
-        # Find the stats container - div with class 'portlet-body fiction-stats'
-        stats_container = soup.find('div', {'class': 'portlet-body fiction-stats'})
-        if not stats_container or not isinstance(stats_container, Tag):
-            return stats
-
-        def find_stat_value(container: Tag, label: str) -> Optional[Union[int, float]]:
-            # Find all li elements with class 'bold uppercase'
-            for li in container.find_all('li', {'class': ['bold', 'uppercase']}):
-                if not isinstance(li, Tag):
+
+        # Walk the label items once; each label's value is in the next <li>
+        seen: set[str] = set()
+        for li in stats_container.iter('li'):
+            if len(seen) == len(STAT_LABELS):
+                break
+            if not {'bold', 'uppercase'} & set(li.get('class', '').split()):
+                continue
+            text = _element_text(li)
+            for label, key in STAT_LABELS:
+                if key in seen or label not in text:
                     continue
-                    
-                if label in li.get_text(strip=True):
-                    value_li = li.find_next_sibling('li')
-                    if isinstance(value_li, Tag):
-                        value = value_li.get_text(strip=True)
-                        return self._parse_number(value)
-            return None
+                seen.add(key)
+                try:
+                    value_li = li.getnext()
+                    while value_li is not None and value_li.tag != 'li':
+                        value_li = value_li.getnext()
+                    if value_li is not None:
+                        value = self._parse_number(_element_text(value_li))
+                        if value is not None:
+                            stats[key] = value
+                except Exception as e:
+                    self.logger.error(f"Error extracting {label}: {e}")
+        
+        return stats
+
+    def _extract_rating(self, rating_span: etree._Element) -> Optional[float]:
+        """Read the rating from a story page's font-red-sunglo span.
+
+        Args:
+            rating_span: The rating span element
+
+        Returns:
+            The rating, or None if it could not be read
+        """
+        # Try aria-label first, then fall back to data-content
+        rating_text = rating_span.get('aria-label') or rating_span.get('data-content', '')
+        # Extract number from format like "4.83 stars" or similar
+        rating = parse_rating(rating_text)
+        if rating is None and rating_text:
+            self.logger.error(f"Failed to convert rating value: {rating_text}")
+        return rating
+
+    def _parse_story_page(self, response: requests.Response) -> Tuple[Optional[float], Dict[str, Union[int, float]]]:
+        """Parse the rating and stats of a story page while its body streams in.
+
+        The page is fed to an incremental lxml parser chunk by chunk, and parsing
+        stops as soon as both the rating span and the stats block have been seen.
+        The rest of the body is still read to completion, unparsed, so the
+        connection can be reused for the next request.
+
+        Args:
+            response: Streamed response for the story page
+
+        Returns:
+            Tuple of (rating, stats dictionary)
+        """
+        parser = etree.HTMLPullParser(events=('start', 'end'))
+        rating_span = None
+        stats = None
+
+        def handle_events():
+            nonlocal rating_span, stats
+            for event, element in parser.read_events():
+                classes = element.get('class', '').split()
+                if event == 'start':
+                    if rating_span is None and element.tag == 'span' and 'font-red-sunglo' in classes:
+                        rating_span = element
+                elif stats is None and element.tag == 'div' and 'fiction-stats' in classes:
+                    stats = self._extract_story_stats(element)
+
+        chunks = response.iter_content(chunk_size=STREAM_CHUNK_SIZE)
+        for chunk in chunks:
+            parser.feed(chunk)
+            handle_events()
+            if rating_span is not None and stats is not None:
+                # Read off the rest of the body unparsed, so the connection
+                # goes back to the pool instead of being closed mid-response
+                for _ in chunks:
+                    pass
+                break
+        else:
+            parser.close()
+            handle_events()
 
-        # Extract all stats
-        stat_mappings = [
-            ('Total Views', 'views'),
-            ('Followers', 'followers'),
-            ('Favorites', 'favorites'),
-            ('Ratings', 'ratings_count'),
-            ('Chapters', 'chapters'),
-            ('Pages', 'pages')
-        ]
-
-        for label, key in stat_mappings:
+        stats = stats or {}
+        rating = None
+        if rating_span is not None:
             try:
-                value = find_stat_value(stats_container, label)
-                if value is not None:
-                    stats[key] = value
+                rating = self._extract_rating(rating_span)
             except Exception as e:
-                self.logger.error(f"Error extracting {label}: {e}")
-        
-        return stats
+                self.logger.error(f"Error extracting rating: {e}")
+        if rating is not None:
+            stats['rating'] = rating
+        return rating, stats
 
     def _get_story_ratings(self, url: Optional[str]) -> Tuple[Optional[float], Dict[str, Union[int, float]]]:
         """Fetch and parse additional stats from a story's detail page.
@@ -108,44 +262,39 @@ class RoyalRoadScraper:
         if not url:
             return None, {}
         
+        # Send the validators from the last scrape so an unchanged page comes back as 304
+        cached = self.page_cache.get(url)
+        headers = {}
+        if cached:
+            if cached.get('etag'):
+                headers['If-None-Match'] = cached['etag']
+            if cached.get('last_modified'):
+                headers['If-Modified-Since'] = cached['last_modified']
+        
         try:
-            self.logger.debug(f"Fetching story page {url}")
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
+            with self._fetch(url, headers, stream=True) as response:
+                if response.status_code == 304 and cached:
+                    self.logger.debug("Story page not modified, using cached stats: %s", url)
+                    stats = dict(cached['stats'])
+                    return stats.get('rating'), stats
+                rating, stats = self._parse_story_page(response)
         except Exception as e:
             self.logger.error(f"Error fetching page: {e}", exc_info=True)
             return None, {}
-
-        rating = None
-        stats = self._extract_story_stats(soup)  # Extract stats first
         
-        # Get rating directly from the font-red-sunglo span's aria-label or data-content
-        try:
-            rating_span = soup.find('span', {'class': 'font-red-sunglo'})
-            if rating_span and isinstance(rating_span, Tag):
-                # Try aria-label first
-                rating_text = rating_span.get('aria-label', '')
-                if not rating_text:
-                    # Fall back to data-content
-                    rating_text = rating_span.get('data-content', '')
-                if rating_text and isinstance(rating_text, str):
-                    # Extract number from format like "4.83 stars" or similar
-                    rating_match = re.search(r'([0-9.]+)', rating_text)
-                    if rating_match:
-                        try:
-                            rating = float(rating_match.group(1))
-                        except ValueError:
-                            self.logger.error(f"Failed to convert rating value: {rating_match.group(1)}")
-        except Exception as e:
-            self.logger.error(f"Error extracting rating: {e}")
-
-        time.sleep(self.delay)  # Respect rate limiting
-        if rating is not None:
-            stats['rating'] = rating
+        # Remember the new validators; save_to_database stores them with the story
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if etag or last_modified:
+            self.page_cache[url] = {
+                'etag': etag,
+                'last_modified': last_modified,
+                'stats': stats,
+                'fresh': True
+            }
         return rating, stats
 
-    def _parse_number(self, text: str) -> Optional[Union[int, float]]:
+    def _parse_number(self, text: str) -> Optional[int]:
         """
         Parse a number from text, handling K/M suffixes.
         
@@ -155,67 +304,58 @@ class RoyalRoadScraper:
         Returns:
             Parsed number or None if parsing fails
         """
-        try:
-            if not text:
-                return None
-                
-            # Extract number part using regex
-            number_match = re.search(r'[\d,\.]+', text)
-            if not number_match:
-                return None
-                
-            # Get the matched number string
-            number_str = number_match.group(0).strip().upper()
-            
-            # Handle K/M suffixes
-            multiplier = 1
-            if 'K' in text.upper():
-                multiplier = 1000
-            elif 'M' in text.upper():
-                multiplier = 1000000
-            
-            # Remove commas and convert to float
-            clean_number = float(number_str.replace(',', ''))
-            result = int(clean_number * multiplier)
-            
-            self.logger.debug(f"Parsed number {text} -> {result}")
-            return result
-            
-        except (ValueError, TypeError, AttributeError) as e:
-            self.logger.debug(f"Failed to parse number from '{text}': {e}")
-            return None
+        result = parse_number(text)
+        if result is None:
+            self.logger.debug("Failed to parse number from '%s'", text)
+        else:
+            self.logger.debug("Parsed number %s -> %s", text, result)
+        return result
 
-    def scrape_top_stories(self) -> List[Dict]:
+    def scrape_top_stories(self, db_path: str = DATABASE_PATH) -> List[Story]:
         """
         Scrapes the top stories from Royal Road's trending page.
         
+        Args:
+            db_path: Database holding the story page cache from earlier scrapes
+        
         Returns:
-            List of story dictionaries
+            List of scraped stories
         """
 
         stories = []
         url = f"{self.BASE_URL}/fictions/trending"
 
+        if Path(db_path).exists():
+            with RoyalRoadDatabase(db_path) as db:
+                self.page_cache = db.get_page_cache()
+
         try:
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
+            # BeautifulSoup still read()s the whole body into one bytes object, but
+            # handing it response.raw skips building response.content from joined
+            # chunks first, which would be a second copy of the page
+            with self._fetch(url, stream=True) as response:
+                response.raw.decode_content = True
+                soup = BeautifulSoup(response.raw, 'lxml', parse_only=LIST_PAGE_STRAINER)
 
             # Find all story entries
             story_items = soup.find_all('div', class_='fiction-list-item')
 
             if not story_items:
                 # Try alternative selectors
-                story_items = soup.find_all('div', class_=re.compile(r'fiction-list-item'))
+                story_items = soup.find_all('div', class_=_FICTION_LIST_ITEM_RE)
 
-            self.logger.info(f"Found {len(story_items)} stories")
+            self.logger.info("Found %s stories", len(story_items))
 
-            for item in story_items:
-                story_data = self._parse_story_item(item)
-                if story_data and story_data.get('title'):
-                    stories.append(story_data)
+            # Detail pages are I/O bound, so fetch them concurrently; the shared
+            # rate limiter still spaces the request starts by self.delay
+            title_links = [self._get_title_link(item) for item in story_items]
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                detail_results = list(executor.map(self._get_story_ratings, (url for _, url in title_links)))
 
-            time.sleep(self.delay)
+            for item, (title_link, story_url), (_, detail_stats) in zip(story_items, title_links, detail_results):
+                story_data = self._parse_story_item(item, title_link, story_url, detail_stats)
+                if story_data and story_data.title:
+                    stories.append(story_data)
 
         except Exception as e:
             self.logger.error(f"Error scraping trending page: {e}", exc_info=True)
@@ -223,75 +363,81 @@ class RoyalRoadScraper:
         print(f"Scraped {len(stories)} stories in total.")
         return stories
     
-    def _parse_story_item(self, item) -> Optional[Dict]:
-        """Parse a single story item from the best-rated list page."""
+    def _get_title_link(self, item) -> Tuple[Optional[Tag], Optional[str]]:
+        """Find a list page item's title link and the full story page URL it points to."""
+        title_link = _TITLE_SEL.select_one(item)
+        if title_link and title_link.get('href'):
+            return title_link, f"{self.BASE_URL}{title_link['href']}"
+        return title_link, None
+
+    def _parse_story_item(self, item, title_link: Optional[Tag], story_url: Optional[str],
+                          detail_stats: Optional[Dict] = None) -> Optional[Story]:
+        """Parse a single story item from the best-rated list page.
+
+        Args:
+            item: The fiction-list-item element
+            title_link: The item's title link, from _get_title_link
+            story_url: Full URL of the story page, from _get_title_link
+            detail_stats: Stats already fetched from the story page; fetched here if None
+        """
 
         try:
-            # Title and URL
-            title_elem = item.find('h2', class_='fiction-title')
-            if not title_elem:
+            # Title
+            if not title_link:
                 return None
-            title_link = title_elem.find('a')
-            title = title_link.get_text(strip=True) if title_link else "Unknown"
-            story_url = title_link['href'] if title_link and title_link.get('href') else None
+            title = title_link.get_text(strip=True)
             
             # Extract stats from the list page
-            stats_div = item.find('div', class_='stats')
-            list_page_stats = {}
+            list_page_stats: Dict[str, Union[int, float, None]] = {}
             
-            if stats_div and isinstance(stats_div, Tag):
-                # Views and chapters are directly on the list page
-                for stat in stats_div.find_all('span'):
-                    if not isinstance(stat, Tag):
-                        continue
-                    text = stat.get_text(strip=True)
-                    if 'View' in text:
-                        list_page_stats['views'] = self._parse_number(text)
-                    elif 'Chapter' in text:
-                        list_page_stats['chapters'] = self._parse_number(text)
-                        
-                # Rating is also on the list page
-                rating_div = stats_div.find('span', class_='font-red-sunglo')
-                if rating_div and isinstance(rating_div, Tag):
-                    rating_text = rating_div.get_text(strip=True)
-                    rating_match = re.search(r'([0-9.]+)\s*/\s*5', rating_text)
-                    if rating_match:
-                        try:
-                            list_page_stats['rating'] = float(rating_match.group(1))
-                        except ValueError:
-                            pass
+            # Views and chapters are directly on the list page
+            for stat in _STATS_SPAN_SEL.select(item):
+                text = stat.get_text(strip=True)
+                if 'View' in text:
+                    list_page_stats['views'] = self._parse_number(text)
+                elif 'Chapter' in text:
+                    list_page_stats['chapters'] = self._parse_number(text)
+                    
+            # Rating is also on the list page
+            rating_span = _LIST_RATING_SEL.select_one(item)
+            if rating_span:
+                rating = parse_list_rating(rating_span.get_text(strip=True))
+                if rating is not None:
+                    list_page_stats['rating'] = rating
             
-            # Tags/Genres - in <span class="tags">
-            genres = []
-            tags_span = item.find('span', class_='tags')
-            if tags_span:
-                tag_elements = tags_span.find_all('a', class_='label')
-                genres = [tag.get_text(strip=True) for tag in tag_elements if tag.get_text(strip=True)]
+            # Tags/Genres - <a class="label"> links inside <span class="tags">
+            genres = [text for text in (tag.get_text(strip=True) for tag in _TAG_SEL.select(item)) if text]
             
             # Get additional stats from story page
-            story_url_full = f"{self.BASE_URL}{story_url}" if story_url else None
-            _, detail_stats = self._get_story_ratings(story_url_full)
+            if detail_stats is None:
+                _, detail_stats = self._get_story_ratings(story_url)
             
             # Log stats from both sources
-            self.logger.debug(f"Stats from list page: {list_page_stats}")
-            self.logger.debug(f"Stats from detail page: {detail_stats}")
+            self.logger.debug("Stats from list page: %s", list_page_stats)
+            self.logger.debug("Stats from detail page: %s", detail_stats)
 
             # Combine stats from both pages
             combined_stats = {**list_page_stats, **detail_stats}  # Detail stats take precedence
 
+            # Only freshly fetched pages carry validators to store
+            page = self.page_cache.get(story_url, {}) if story_url else {}
+            fresh = page.get('fresh', False)
 
-            return {
-                'title': title,
-                'url': f"{self.BASE_URL}{story_url}" if story_url else None,
-                'genres': ', '.join(genres) if genres else None,
-                'rating': combined_stats.get('rating'),
-                'followers': combined_stats.get('followers'),
-                'pages': combined_stats.get('pages'),
-                'chapters': combined_stats.get('chapters'),
-                'views': combined_stats.get('views'),
-                'favorites': combined_stats.get('favorites'),
-                'ratings_count': combined_stats.get('ratings_count')
-            }
+            return Story(
+                title=title,
+                url=story_url,
+                genres=', '.join(genres) if genres else None,
+                rating=combined_stats.get('rating'),
+                followers=combined_stats.get('followers'),
+                pages=combined_stats.get('pages'),
+                chapters=combined_stats.get('chapters'),
+                views=combined_stats.get('views'),
+                favorites=combined_stats.get('favorites'),
+                ratings_count=combined_stats.get('ratings_count'),
+                etag=page.get('etag') if fresh else None,
+                last_modified=page.get('last_modified') if fresh else None,
+                cached_stats=json.dumps(page['stats']) if fresh else None
+            )
         
         except Exception as e:
             print(f"Error parsing story item: {e}")
@@ -299,12 +445,12 @@ class RoyalRoadScraper:
             traceback.print_exc()
             return None
     
-    def save_to_database(self, stories: List[Dict], db_path: str = DATABASE_PATH):
+    def save_to_database(self, stories: List[Story], db_path: str = DATABASE_PATH):
         """
         Saves the list of stories to a SQLite database.
         
         Args:
-            stories: List of story metadata dictionaries.
+            stories: List of scraped stories.
             db_path: Path to the SQLite database file.
 
         Returns:
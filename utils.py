@@ -1,86 +1,333 @@
 """
 Utility functions for Royal Road data analysis
 """
+import functools
+import hashlib
+import json
+import os
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import sqlite3
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from config import DATABASE_PATH, LATEST_STORIES_QUERY, ALL_SNAPSHOTS_QUERY
+from typing import Iterator, Union
+from config import (
+    DATABASE_PATH, SNAPSHOT_MIRROR_PATH, LATEST_STORIES_QUERY, LATEST_STORIES_FALLBACK_QUERY, ALL_SNAPSHOTS_QUERY
+)
+from database import borrow, get_database_mtime
 
-def load_latest_data() -> tuple[pd.DataFrame, pd.DataFrame]:
+try:
+    # Optional: reads query results as Arrow columns instead of row tuples
+    import connectorx as cx
+except ImportError:
+    cx = None
+
+try:
+    # Optional: lazy, column-pruned reads of the snapshot history
+    import polars as pl
+except ImportError:
+    pl = None
+
+try:
+    # Optional: compiles create_buckets' assignment loop to parallel machine code
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+# Frames from the last load_latest_data call, keyed by the database's state
+_latest_data_cache: dict = {}
+
+# Snapshot rows per DataFrame when streaming the history
+SNAPSHOT_CHUNK_SIZE = 100_000
+
+# Text columns with few distinct values, stored as categoricals after loading
+# (and so dictionary-encoded in the Parquet mirror)
+CATEGORY_COLUMNS = ('genre',)
+
+# Recent create_buckets results, keyed by a digest of the input values
+BUCKET_CACHE_SIZE = 64
+_bucket_cache: "OrderedDict[tuple, pd.Categorical]" = OrderedDict()
+
+def _database_signature() -> tuple[int, int]:
+    """Modification time and size of the database, which change on every write"""
+    try:
+        size = Path(DATABASE_PATH).stat().st_size
+    except FileNotFoundError:
+        size = 0
+    return get_database_mtime(DATABASE_PATH), size
+
+def parquet_cache_is_current(path: Union[str, Path], signature: object) -> bool:
+    """Whether a file written by write_parquet_cache was read at this database signature"""
+    try:
+        metadata = pq.read_schema(path).metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return False
+    return metadata.get(b'db_signature') == json.dumps(signature).encode()
+
+def write_parquet_cache(df: pd.DataFrame, path: Union[str, Path], signature: object) -> None:
+    """
+    Write a DataFrame to Parquet along with the database signature it was read at
+    
+    The signature must be taken before the query runs, so a write that lands
+    mid-read leaves the file stale rather than passing it off as current.
+    """
+    path = Path(path)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        b'db_signature': json.dumps(signature).encode(),
+    })
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Written beside the target and renamed, so readers never see half a file
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass  # The cache is optional; callers already have the fresh data
+
+def _match_sqlite3_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """Give a connectorx result the column types pd.read_sql_query returns for the same query"""
+    for column in df.columns:
+        series = df[column]
+        if isinstance(series.dtype, pd.Int64Dtype):
+            # sqlite3 yields plain ints, or floats when the column has NULLs
+            df[column] = series.astype('float64' if series.hasnans else 'int64')
+        elif pd.api.types.is_datetime64_any_dtype(series):
+            # sqlite3 leaves declared TIMESTAMP columns as SQLite's text
+            text = series.dt.strftime('%Y-%m-%d %H:%M:%S').astype(object).where(series.notna(), None)
+            df[column] = text.infer_objects()
+        elif pd.api.types.is_string_dtype(series):
+            # Text gets the string dtype pandas infers for sqlite3's str values
+            df[column] = series.astype(object).where(series.notna(), None).infer_objects()
+    return df
+
+def _read_query(query: str) -> pd.DataFrame:
+    """Run a query against the database, through connectorx when it is installed"""
+    if cx is not None:
+        return _match_sqlite3_dtypes(cx.read_sql(f"sqlite://{Path(DATABASE_PATH).resolve()}", query))
+    
+    with borrow(DATABASE_PATH) as conn:
+        return pd.read_sql_query(query, conn)
+
+def _latest_stories_query() -> str:
+    """LATEST_STORIES_QUERY, or its fallback when the database predates the latest_snapshots table"""
+    with borrow(DATABASE_PATH) as conn:
+        has_table = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'latest_snapshots'"
+        ).fetchone()
+    return LATEST_STORIES_QUERY if has_table else LATEST_STORIES_FALLBACK_QUERY
+
+def _read_queries(*queries: str) -> list[pd.DataFrame]:
+    """Run independent queries concurrently, each on its own connection"""
+    if len(queries) == 1:
+        return [_read_query(queries[0])]
+    
+    # SQLite releases the GIL while stepping through rows, and WAL lets readers run side by side
+    with ThreadPoolExecutor(max_workers=len(queries)) as executor:
+        return list(executor.map(_read_query, queries))
+
+def _add_timestamps(df: pd.DataFrame) -> pd.DataFrame:
+    """Turn the scraped_epoch column (Unix seconds computed by SQLite) into last_updated"""
+    # Fixed to nanoseconds so the column survives the Parquet mirror unchanged
+    df['last_updated'] = pd.to_datetime(df.pop('scraped_epoch'), unit='s').astype('datetime64[ns]')
+    return df
+
+def _shrink(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Store integer columns in the smallest integer type that holds their values
+    and CATEGORY_COLUMNS as categoricals. Floats keep full precision.
+    
+    Arithmetic that could outgrow a column's current range should cast it
+    to a wider type first.
+    """
+    for column in df.columns:
+        if pd.api.types.is_integer_dtype(df[column]):
+            df[column] = pd.to_numeric(df[column], downcast='integer')
+        elif column in CATEGORY_COLUMNS:
+            df[column] = df[column].astype('category')
+    return df
+
+def iter_snapshots(chunksize: int = SNAPSHOT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """
+    Stream all historical snapshots in chunks instead of one DataFrame
+    
+    A pooled connection is held until the iterator is exhausted or closed.
+    
+    Args:
+        chunksize: Number of snapshot rows per chunk
+        
+    Yields:
+        DataFrames with the same columns as load_latest_data's all_snapshots_df
+    """
+    with borrow(DATABASE_PATH) as conn:
+        for chunk in pd.read_sql_query(ALL_SNAPSHOTS_QUERY, conn, chunksize=chunksize):
+            yield _add_timestamps(chunk)
+
+def load_latest_data(stream: bool = False) -> tuple[pd.DataFrame, Union[pd.DataFrame, Iterator[pd.DataFrame]]]:
     """
     Load both latest and all historical data from the database
     
+    Integer columns are downcast and genre is categorical (see _shrink).
+    The frames are kept until the database changes, so repeated calls only
+    stat the file. Callers get copies they are free to modify; use
+    clear_latest_data_cache() to force a reload. The history is also
+    mirrored to Parquet at SNAPSHOT_MIRROR_PATH, so a new process reads it
+    from there instead of SQLite until the database changes.
+    
+    Args:
+        stream: Return the history as an iterator of chunks (see iter_snapshots),
+            so callers that only aggregate never hold all of it in memory
+    
     Returns:
         tuple: (latest_data_df, all_snapshots_df)
     """
+    key = _database_signature()
+    cached = _latest_data_cache.get(key)
+    if cached is not None:
+        return cached[0].copy(), iter_snapshots() if stream else cached[1].copy()
+    
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        
-        # Load latest metrics for each story
-        df_latest = pd.read_sql_query(LATEST_STORIES_QUERY, conn)
-        
-        # Load all historical snapshots for time-series analysis
-        df_all = pd.read_sql_query(ALL_SNAPSHOTS_QUERY, conn)
+        latest_query = _latest_stories_query()
+        if stream:
+            df_latest, = _read_queries(latest_query)
+            return _shrink(_add_timestamps(df_latest)), iter_snapshots()
         
-        conn.close()
+        # Latest metrics for each story, and all historical snapshots for time-series analysis
+        mirror_path = Path(SNAPSHOT_MIRROR_PATH)
+        if key[0] and parquet_cache_is_current(mirror_path, key):
+            df_latest, = _read_queries(latest_query)
+            df_all = pd.read_parquet(mirror_path, memory_map=True)
+        else:
+            df_latest, df_all = _read_queries(latest_query, ALL_SNAPSHOTS_QUERY)
+            # SQLite already turned the timestamps into Unix seconds
+            df_all = _shrink(_add_timestamps(df_all))
+            write_parquet_cache(df_all, mirror_path, key)
+        df_latest = _shrink(_add_timestamps(df_latest))
         
-        # Convert scraped_date to datetime
-        df_latest['last_updated'] = pd.to_datetime(df_latest['scraped_date'])
-        df_all['last_updated'] = pd.to_datetime(df_all['scraped_date'])
-        
-        return df_latest, df_all
+        _latest_data_cache.clear()
+        _latest_data_cache[key] = (df_latest, df_all)
+        return df_latest.copy(), df_all.copy()
         
     except Exception as e:
         print(f"Error loading data: {e}")
         return pd.DataFrame(), pd.DataFrame()
 
+def clear_latest_data_cache() -> None:
+    """Drop the frames kept by load_latest_data, so the next call loads them again"""
+    _latest_data_cache.clear()
+
+def load_latest_data_lazy() -> "pl.LazyFrame":
+    """
+    Load all historical snapshots as a polars LazyFrame
+    
+    While the Parquet mirror is current, the history is scanned from it, so
+    filters and column selections are pushed into the read and untouched
+    data is never decoded. Otherwise it is read from SQLite (through
+    connectorx when installed), shrunk like load_latest_data's history and
+    written to the mirror for the next call. Either way, .collect().to_pandas()
+    gives the same columns and dtypes as load_latest_data's all_snapshots_df.
+    
+    Returns:
+        LazyFrame over the snapshot history
+    """
+    if pl is None:
+        raise ImportError("load_latest_data_lazy requires polars (pip install polars)")
+    
+    key = _database_signature()
+    mirror_path = Path(SNAPSHOT_MIRROR_PATH)
+    if key[0] and parquet_cache_is_current(mirror_path, key):
+        return pl.scan_parquet(mirror_path)
+    
+    # Read the way load_latest_data does, so both paths have the mirror's schema
+    df_all, = _read_queries(ALL_SNAPSHOTS_QUERY)
+    df_all = _shrink(_add_timestamps(df_all))
+    write_parquet_cache(df_all, mirror_path, key)
+    return pl.from_pandas(df_all).lazy()
+
 def get_database_stats() -> dict:
     """Get basic statistics about the database"""
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
-        
-        # Get total stories
-        cursor.execute("SELECT COUNT(*) FROM stories")
-        total_stories = cursor.fetchone()[0]
-        
-        # Get total snapshots
-        cursor.execute("SELECT COUNT(*) FROM story_snapshots")
-        total_snapshots = cursor.fetchone()[0]
-        
-        # Get stories with multiple snapshots
-        cursor.execute("""
-            SELECT COUNT(DISTINCT story_id) 
-            FROM story_snapshots 
-            WHERE story_id IN (
-                SELECT story_id 
-                FROM story_snapshots 
-                GROUP BY story_id 
-                HAVING COUNT(*) > 1
-            )
-        """)
-        stories_with_history = cursor.fetchone()[0]
-        
-        conn.close()
+        # Total stories, total snapshots and stories with multiple snapshots in one round-trip
+        with borrow(DATABASE_PATH) as conn:
+            # Named rows on this cursor only; the pooled connection keeps plain tuples
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
+            row = cursor.execute("""
+                SELECT
+                    (SELECT COUNT(*) FROM stories) AS total_stories,
+                    (SELECT COUNT(*) FROM story_snapshots) AS total_snapshots,
+                    (SELECT COUNT(*) FROM (
+                        SELECT 1
+                        FROM story_snapshots
+                        GROUP BY story_id
+                        HAVING COUNT(*) > 1
+                    )) AS stories_with_history
+            """).fetchone()
         
-        return {
-            'total_stories': total_stories,
-            'total_snapshots': total_snapshots,
-            'stories_with_history': stories_with_history
-        }
+        return dict(row)
         
     except Exception as e:
         print(f"Error getting database stats: {e}")
         return {}
 
+if njit is not None:
+    @njit(parallel=True, cache=True)
+    def _assign_buckets(values, edges, codes):
+        """Write each value's bucket code (the number of edges below it) into codes, skipping NaNs"""
+        for i in prange(values.size):
+            if not np.isnan(values[i]):
+                codes[i] = np.searchsorted(edges, values[i])
+else:
+    def _assign_buckets(values, edges, codes):
+        """Write each value's bucket code (the number of edges below it) into codes, skipping NaNs"""
+        valid = ~np.isnan(values)
+        codes[valid] = np.searchsorted(edges, values[valid], side='left')
+
 def create_buckets(series: pd.Series, n_buckets: int = 10) -> pd.Series:
     """
     Creates equal-size buckets (quantiles) from a numerical series.
     Each bucket contains roughly the same number of stories.
     Bucket 1 has the lowest values, Bucket 10 has the highest values.
+    Repeated quantile edges are merged, leaving fewer buckets; missing values stay NaN.
+    The last BUCKET_CACHE_SIZE results are reused for series with identical values.
     """
-    try:
-        return pd.qcut(series, n_buckets, labels=[f'Bucket {i+1}' for i in range(n_buckets)])
-    except ValueError:
-        # Handle case where there are duplicate values
-        return pd.qcut(series, n_buckets, labels=[f'Bucket {i+1}' for i in range(n_buckets)], duplicates='drop')
\ No newline at end of file
+    values = series.to_numpy(dtype='float64', na_value=np.nan)
+    key = (hashlib.blake2b(values.tobytes(), digest_size=16).digest(), len(values), n_buckets)
+    buckets = _bucket_cache.get(key)
+    if buckets is None:
+        buckets = _compute_buckets(values, n_buckets)
+        _bucket_cache[key] = buckets
+        if len(_bucket_cache) > BUCKET_CACHE_SIZE:
+            _bucket_cache.popitem(last=False)
+    else:
+        _bucket_cache.move_to_end(key)
+    
+    # Copied so that edits to the returned series never reach the cache
+    return pd.Series(buckets.copy(), index=series.index, name=series.name)
+
+@functools.lru_cache(maxsize=None)
+def _bucket_labels(n_buckets: int) -> tuple[str, ...]:
+    """The labels 'Bucket 1' to 'Bucket N', built once per bucket count"""
+    return tuple(f'Bucket {i+1}' for i in range(n_buckets))
+
+def _compute_buckets(values: np.ndarray, n_buckets: int) -> pd.Categorical:
+    """Bucket float64 values (NaN for missing) into ordered 'Bucket N' categories"""
+    valid = ~np.isnan(values)
+    labels = _bucket_labels(n_buckets)
+    codes = np.full(len(values), -1, dtype=np.int8 if n_buckets < 128 else np.int32)
+    
+    if valid.any():
+        # Same edges as pd.qcut(..., duplicates='drop'), without its interval and label
+        # objects; like qcut, quantiles that are not exact in binary are rounded up
+        quantiles = np.linspace(0, 1, n_buckets + 1)
+        np.putmask(quantiles, n_buckets * quantiles != np.arange(n_buckets + 1), np.nextafter(quantiles, 1))
+        edges = np.unique(np.quantile(values[valid], quantiles))
+        # Bins are closed on the right, so a value equal to an edge goes to the lower bucket
+        _assign_buckets(values, edges[1:-1], codes)
+        labels = labels[:max(len(edges) - 1, 1)]
+    
+    return pd.Categorical.from_codes(codes, categories=labels, ordered=True)